@@ -32,3 +32,10 @@ api_url = config[env.upper()]['API_URL']
 api_key = config[env.upper()]['API_KEY']
 # Password credential to authenticate against the Campaign API
 api_password = config[env.upper()]['API_PASSWORD']
+
+# Optional path of the seen activity index. When set, activities already applied by an earlier session are skipped
+seen_index_path = config[env.upper()].get('SEEN_ACTIVITY_INDEX_PATH')
+# Number of publish sequences the seen activity index retains for the subscription. None retains everything
+seen_index_retention = config[env.upper()].get('SEEN_ACTIVITY_INDEX_RETENTION')
+# Optional path of the persisted transaction aggregates maintained by sync_cal_transactions_example.py
+transaction_aggregates_path = config[env.upper()].get('TRANSACTION_AGGREGATES_PATH')
@@ -0,0 +1,4 @@
+# Sync activity fields shared by the modules that consume activity topics
+ACTIVITY_ID_FIELD = 'id'
+ACTIVITY_SEQUENCE_FIELD = 'publishSequence'
+ACTIVITY_TYPE_FIELD = 'activityType'
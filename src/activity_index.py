@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import math
+import sqlite3
+
+from activity_fields import ACTIVITY_ID_FIELD, ACTIVITY_SEQUENCE_FIELD
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed size in-memory Bloom filter used to answer most 'not seen' lookups without touching disk"""
+
+    def __init__(self, expected_items=100000, false_positive_rate=0.01):
+        expected_items = max(expected_items, 1)
+        self.bit_count = max(int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.bit_count / expected_items * math.log(2))), 1)
+        self.bits = bytearray((self.bit_count + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.bit_count
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenActivityIndex:
+    """
+    Persistent index of activities already applied downstream for a single SyncSubscription.
+
+    Applied activity IDs and publish sequences are stored in a SQLite file, with a Bloom filter
+    in front so that new activities are rejected from the index without a disk lookup. When a
+    session is canceled and retried, activities from the repeated sequence range are dropped
+    before they reach the sink.
+
+    retention is the number of publish sequences to keep below the highest applied sequence.
+    Older entries are pruned when the index is saved. None keeps every entry.
+    """
+
+    def __init__(self, path, subscription_id, retention=None, expected_items=100000, false_positive_rate=0.01):
+        self.path = path
+        self.subscription_id = subscription_id
+        self.retention = retention
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen_activity ('
+                                'subscription_id TEXT NOT NULL, '
+                                'activity_id TEXT NOT NULL, '
+                                'sequence INTEGER NOT NULL, '
+                                'PRIMARY KEY (subscription_id, activity_id)) WITHOUT ROWID')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS seen_activity_sequence '
+                                'ON seen_activity (subscription_id, sequence)')
+        self.connection.commit()
+        self.expected_items = expected_items
+        self.false_positive_rate = false_positive_rate
+        self.bloom = None
+        self.bloom_capacity = 0
+        self.item_count = 0
+        self.max_sequence = None
+        self.skipped_count = 0
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, traceback=None):
+        self.close()
+
+    def _load(self):
+        """Builds the Bloom filter from the stored entries, sized for at least the number of entries on disk"""
+        row_count = self.connection.execute('SELECT COUNT(*) FROM seen_activity WHERE subscription_id = ?',
+                                            (self.subscription_id,)).fetchone()[0]
+        self.bloom_capacity = max(self.expected_items, row_count * 2)
+        self.bloom = BloomFilter(self.bloom_capacity, self.false_positive_rate)
+        self.item_count = 0
+        self.max_sequence = None
+        cursor = self.connection.execute('SELECT activity_id, sequence FROM seen_activity WHERE subscription_id = ?',
+                                         (self.subscription_id,))
+        for activity_id, sequence in cursor:
+            self.bloom.add(self._key(activity_id, sequence))
+            if self.max_sequence is None or sequence > self.max_sequence:
+                self.max_sequence = sequence
+            self.item_count += 1
+        logger.debug(f'Loaded {self.item_count} seen activities for SyncSubscription {self.subscription_id}')
+
+    @staticmethod
+    def _key(activity_id, sequence):
+        return f'{activity_id}:{sequence}'
+
+    @staticmethod
+    def _identity(activity):
+        return str(activity[ACTIVITY_ID_FIELD]), int(activity[ACTIVITY_SEQUENCE_FIELD])
+
+    def contains(self, activity):
+        activity_id, sequence = self._identity(activity)
+        if self._key(activity_id, sequence) not in self.bloom:
+            return False
+        row = self.connection.execute('SELECT 1 FROM seen_activity '
+                                      'WHERE subscription_id = ? AND activity_id = ? AND sequence = ?',
+                                      (self.subscription_id, activity_id, sequence)).fetchone()
+        return row is not None
+
+    def add(self, activity):
+        activity_id, sequence = self._identity(activity)
+        updated = self.connection.execute('UPDATE seen_activity SET sequence = ? '
+                                          'WHERE subscription_id = ? AND activity_id = ?',
+                                          (sequence, self.subscription_id, activity_id)).rowcount
+        if not updated:
+            self.connection.execute('INSERT INTO seen_activity (subscription_id, activity_id, sequence) '
+                                    'VALUES (?, ?, ?)', (self.subscription_id, activity_id, sequence))
+            self.item_count += 1
+        self.bloom.add(self._key(activity_id, sequence))
+        if self.max_sequence is None or sequence > self.max_sequence:
+            self.max_sequence = sequence
+
+    def filter(self, activities):
+        """Returns the activities that have not already been applied"""
+        unseen = []
+        for activity in activities:
+            if self.contains(activity):
+                self.skipped_count += 1
+            else:
+                unseen.append(activity)
+        return unseen
+
+    def mark_applied(self, activities):
+        for activity in activities:
+            self.add(activity)
+
+    def save(self):
+        """
+        Prunes entries outside the retention window and writes pending entries to disk. The Bloom filter
+        is rebuilt when entries were pruned or it holds more entries than it was sized for.
+        """
+        pruned = 0
+        if self.retention is not None and self.max_sequence is not None:
+            cutoff = self.max_sequence - self.retention
+            pruned = self.connection.execute('DELETE FROM seen_activity WHERE subscription_id = ? AND sequence < ?',
+                                             (self.subscription_id, cutoff)).rowcount
+            if pruned:
+                logger.debug(f'Pruned {pruned} seen activities below sequence {cutoff}')
+        self.connection.commit()
+        if pruned or self.item_count > self.bloom_capacity:
+            self._load()
+        if self.skipped_count:
+            logger.info(f'Skipped {self.skipped_count} previously applied activities')
+            self.skipped_count = 0
+
+    def close(self):
+        self.save()
+        self.connection.close()
@@ -4,6 +4,7 @@ import sys
 sys.path.append('../')
 
 from src import *
+from src.activity_index import SeenActivityIndex
 from enum import Enum
 import argparse
 import requests
@@ -250,17 +251,31 @@ class CampaignApiClient:
                 f'Error requesting Url: {url}, Response code: {response.status_code}. Error Message: {response.text}')
         return response.json()
 
-    def sync_topic_for_session(self, domain, session_id_arg, topic_name, page_size_arg):
+    def iter_sync_topic(self, domain, session_id_arg, topic_name, page_size_arg, seen_index=None):
+        """
+        Yields each activity of the topic for the session. If a SeenActivityIndex is supplied,
+        activities that were already applied are skipped, and each yielded activity is recorded
+        as applied once the caller has finished handling it.
+        """
         offset = 0
         has_next_page = True
         while has_next_page:
             qr = self.read_sync_topic(domain, session_id_arg, topic_name, page_size_arg, offset)
             has_next_page = qr['hasNextPage']
             offset = offset + page_size_arg
-
+            activities = qr['results']
+            if seen_index is not None:
+                activities = seen_index.filter(activities)
+            for activity in activities:
+                yield activity
+                if seen_index is not None:
+                    seen_index.add(activity)
+
+    def sync_topic_for_session(self, domain, session_id_arg, topic_name, page_size_arg, seen_index=None):
+        for activity in self.iter_sync_topic(domain, session_id_arg, topic_name, page_size_arg, seen_index):
             # TODO - Plug in your logic to handle the data here
-            # for activity in qr['results']:
-            #     print(activity)
+            # print(activity)
+            pass
 
 
 def write_subscription_id(id_arg):
@@ -307,6 +322,7 @@ if __name__ == '__main__':
                 sub_name = "My Sync Subscription"
                 topics = args.sync_topics[0].split(",")
                 sync_session = None
+                seen_index = None
                 feed_name = 'filing_v101'
                 try:
                     # Create SyncSubscription or use existing SyncSubscription with feed specified
@@ -320,6 +336,10 @@ if __name__ == '__main__':
                     else:
                         sub_id = cal_subscription_id
 
+                    # Optionally skip activities already applied by an earlier (possibly canceled) session
+                    if seen_index_path:
+                        seen_index = SeenActivityIndex(seen_index_path, sub_id, seen_index_retention)
+
                     # Create SyncSession
                     logger.info('Creating sync session')
                     range_limit = 10000
@@ -337,22 +357,29 @@ if __name__ == '__main__':
                             page_size = 1000
                             logger.info(f'Synchronizing {topic}')
                             session_id = sync_session['id']
-                            campaign_api_client.sync_topic_for_session(default_domain, session_id, topic, page_size)
+                            campaign_api_client.sync_topic_for_session(default_domain, session_id, topic, page_size,
+                                                                       seen_index)
 
                             # Fetch Filing Contents
 
                         # Complete SyncSession
                         logger.info('Completing session')
                         campaign_api_client.execute_session_command(sess_id, SyncSessionCommandType.Complete.name)
+                        if seen_index is not None:
+                            seen_index.save()
                         sync_session_response = campaign_api_client.create_session(sub_id, range_limit)
 
                     logger.info('Sync Complete')
                 except Exception as ex:
                     # Cancel Session on error
                     if sync_session is not None:
-                        campaign_api_client.execute_session_command(sync_session.id, SyncSessionCommandType.Cancel.name)
+                        campaign_api_client.execute_session_command(sync_session['id'], SyncSessionCommandType.Cancel.name)
                     logger.error('Error attempting to sync: %s', ex)
                     sys.exit()
+                finally:
+                    # Activities applied before a cancel are kept so the retried session can skip them
+                    if seen_index is not None:
+                        seen_index.close()
         except Exception as ex:
             logger.error('Error running Campaign API client %s', ex)
             sys.exit()
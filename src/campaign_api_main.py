@@ -6,6 +6,7 @@ import time
 
 from __init__ import *
 
+from activity_index import SeenActivityIndex
 from campaign_api_client import CampaignApiClient, SyncSessionCommandType
 
 
@@ -30,6 +31,7 @@ def main():
     sync_session = None
     api_client = None
     sub_id = None
+    seen_index = None
     try:
         logger.info(f'Starting {domain} Campaign API synchronization lifecycle for Agency {agency_id}')
         api_client = CampaignApiClient(api_url, api_key, api_password, agency_id)
@@ -52,6 +54,10 @@ def main():
             else:
                 sub_id = cal_subscription_id
 
+            # Optionally skip activities already applied by an earlier (possibly canceled) session
+            if seen_index_path:
+                seen_index = SeenActivityIndex(seen_index_path, sub_id, seen_index_retention)
+
             # Create SyncSession
             logger.info('Creating sync session')
             range_limit = 10000
@@ -88,6 +94,7 @@ def main():
                     total_time = end_time-start_time
                     topic_request_times.append(total_time)
                     print_query_results(query_results, total_time)
+                    apply_query_results(query_results, seen_index)
                     while query_results['hasNextPage']:
                         offset = offset + page_size
                         start_time = time.time()
@@ -96,6 +103,7 @@ def main():
                         total_time = end_time-start_time
                         topic_request_times.append(total_time)
                         print_query_results(query_results, total_time)
+                        apply_query_results(query_results, seen_index)
                     logger.info(f'Average time for {topic} sync read is {sum(topic_request_times) / len(topic_request_times)} seconds\n')
 
                 logger.info('Completing sync session\n')
@@ -105,6 +113,8 @@ def main():
                 logger.info(f'Total time for sync session: {session_end - session_start} seconds\n')
 
                 api_client.execute_session_command(session_id, SyncSessionCommandType.Complete.name)
+                if seen_index is not None:
+                    seen_index.save()
 
                 # Create a new syncSession looking for more available data to pull
                 sync_session_response = api_client.create_session(sub_id, range_limit)
@@ -121,10 +131,33 @@ def main():
         if sync_session is not None:
             logger.info('Error occurred, canceling sync session')
             api_client.execute_session_command(sync_session['id'], SyncSessionCommandType.Cancel.name)
+    finally:
+        # Activities applied before a cancel are kept so the retried session can skip them
+        if seen_index is not None:
+            seen_index.close()
 
     sys.exit()
 
 
+def apply_query_results(query_results, seen_index=None):
+    """
+    Passes each record of the page to apply_record. If a SeenActivityIndex is supplied, records that were
+    already applied are skipped, and each record is marked as applied once apply_record has handled it.
+    """
+    results = query_results['results']
+    if seen_index is not None:
+        results = seen_index.filter(results)
+    for result in results:
+        apply_record(result)
+        if seen_index is not None:
+            seen_index.add(result)
+
+
+def apply_record(record):
+    """Stores a synchronized record. This example only logs it"""
+    logger.debug(f'Applied record {record["id"]}')
+
+
 def print_query_results(query_results, seconds_to_complete):
     page_number = query_results["pageNumber"]
     page_size = query_results["limit"]
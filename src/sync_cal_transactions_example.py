@@ -6,6 +6,7 @@ import time
 
 from src import *
 from src.campaign_api_client import CampaignApiClient, SyncSessionCommandType
+from src.transaction_aggregates import TransactionAggregates
 
 
 def write_config_param(param, value):
@@ -20,6 +21,7 @@ def main():
     1) Create a Cal SyncSubscription
     2) Create a Cal SyncSession using the SyncSubscription. This will be the start of the session
     3) Synchronize CAL Element Activities with element classification of UnitemizedTransaction
+    4) Update the running transaction aggregates from the Element Activities, if configured
     7) Complete the SyncSession. This will be the end of the session
     """
 
@@ -27,6 +29,7 @@ def main():
     agency_id = 'TEST'
     sync_session = None
     api_client = None
+    aggregates = None
     try:
         logger.info(f'Starting {domain} Campaign API synchronization lifecycle for Agency {agency_id}')
         api_client = CampaignApiClient(api_url, api_key, api_password, agency_id)
@@ -52,6 +55,10 @@ def main():
             else:
                 sub_id = cal_subscription_id
 
+            # Totals per filer, committee and period are kept up to date from each session's activities
+            if transaction_aggregates_path:
+                aggregates = TransactionAggregates(transaction_aggregates_path)
+
             # Create SyncSession
             logger.info('Creating sync session')
 
@@ -79,6 +86,8 @@ def main():
                     total_time = end_time-start_time
                     topic_request_times.append(total_time)
                     print_query_results(query_results, total_time)
+                    if aggregates is not None:
+                        aggregates.apply_all(query_results['results'])
                     while query_results['hasNextPage']:
                         offset = offset + page_size
                         start_time = time.time()
@@ -87,6 +96,8 @@ def main():
                         total_time = end_time-start_time
                         topic_request_times.append(total_time)
                         print_query_results(query_results, total_time)
+                        if aggregates is not None:
+                            aggregates.apply_all(query_results['results'])
                     logger.info(f'Average time for {topic} sync read is {sum(topic_request_times) / len(topic_request_times)} seconds\n')
 
                 logger.info('Completing sync session\n')
@@ -95,6 +106,10 @@ def main():
                 session_end = time.time()
                 logger.info(f'Total time for sync session: {session_end - session_start} seconds\n')
 
+                # Aggregates are committed before the session is Completed. If Complete fails they stay
+                # committed, and the replayed range is ignored by the aggregates
+                if aggregates is not None:
+                    aggregates.commit()
                 api_client.execute_session_command(session_id, SyncSessionCommandType.Complete.name)
 
             logger.info(f'Synchronization lifecycle complete\n\n')
@@ -110,6 +125,13 @@ def main():
             logger.info('Error occurred, canceling sync session')
             api_client.execute_session_command(sync_session['id'], SyncSessionCommandType.Cancel.name)
 
+        # Discard aggregate changes that were not committed. Changes committed before a failed Complete are kept
+        if aggregates is not None:
+            aggregates.rollback()
+    finally:
+        if aggregates is not None:
+            aggregates.close()
+
     sys.exit()
 
 
@@ -0,0 +1,212 @@
+import json
+import logging
+import sqlite3
+from decimal import Decimal
+
+from activity_fields import ACTIVITY_ID_FIELD, ACTIVITY_SEQUENCE_FIELD, ACTIVITY_TYPE_FIELD
+
+logger = logging.getLogger(__name__)
+
+# Element activity fields used to build the aggregates. The assumed shape of an element activity is
+# {
+#     'id': <activity id>,
+#     'publishSequence': <sequence the activity was published at>,
+#     'activityType': <'Add', 'Amend', ... or one of RETRACTION_ACTIVITY_TYPES when the element was removed>,
+#     'element': {
+#         'rootFilingNid': <filing the element belongs to, shared by all amendments of the filing>,
+#         'elementId': <transaction id, shared by all amendments of the transaction>,
+#         'elementNid': <id of this version of the element, unique to each amendment>,
+#         'filerNid': <filer of the filing>,
+#         'elementModel': {'amount': <transaction amount>, 'cmteId': <committee id>, 'tranDate': <'YYYY-MM-DD'>}
+#     }
+# }
+ELEMENT_FIELD = 'element'
+ELEMENT_MODEL_FIELD = 'elementModel'
+RETRACTION_ACTIVITY_TYPES = ('Retract', 'Delete')
+
+TOTAL_DIMENSION = 'total'
+
+
+def _element(activity):
+    return activity.get(ELEMENT_FIELD) or {}
+
+
+def _element_model(activity):
+    return _element(activity).get(ELEMENT_MODEL_FIELD) or {}
+
+
+def default_element_key(activity):
+    """
+    Identifies the transaction an element activity contributes to. An amended element shares the
+    key of the element it replaces, so its contribution replaces the earlier one.
+    """
+    element = _element(activity)
+    root_filing_nid = element.get('rootFilingNid')
+    element_id = element.get('elementId')
+    if root_filing_nid is None or element_id is None:
+        raise Exception(f'Element activity {activity.get(ACTIVITY_ID_FIELD)} has no rootFilingNid or elementId')
+    return f'{root_filing_nid}:{element_id}'
+
+
+def default_element_version(activity):
+    """Identifies the version of the transaction, so a retraction only backs out the version it names"""
+    element_nid = _element(activity).get('elementNid')
+    if element_nid is None:
+        raise Exception(f'Element activity {activity.get(ACTIVITY_ID_FIELD)} has no elementNid')
+    return str(element_nid)
+
+
+def default_amount(activity):
+    amount = _element_model(activity).get('amount')
+    if amount is None:
+        raise Exception(f'Element activity {activity.get(ACTIVITY_ID_FIELD)} has no amount')
+    return Decimal(str(amount))
+
+
+def default_dimensions(activity):
+    """
+    Returns the rollup values for the activity. Rollups with a value of None are not updated.
+    The period is the calendar month of the transaction date, as element activities do not carry
+    the reporting period of their filing.
+    """
+    element = _element(activity)
+    model = _element_model(activity)
+    filer = element.get('filerNid')
+    committee = model.get('cmteId')
+    tran_date = model.get('tranDate')
+    period = tran_date[:7] if tran_date else None
+    return {
+        'filer': filer,
+        'committee': committee,
+        'period': period,
+        'filer_period': f'{filer}|{period}' if filer is not None and period is not None else None
+    }
+
+
+class TransactionAggregates:
+    """
+    Running totals of element activity transactions, maintained incrementally from the element
+    activity topic and persisted in a SQLite file between sessions.
+
+    The contribution of each transaction is kept, with the element version it came from, so that
+    an amended element replaces what the earlier version added. A retraction only backs out the
+    contribution when it names the version that is currently counted; retracting a superseded
+    version leaves the amended one in place. A retracted transaction leaves a tombstone with its
+    sequence, so an older activity for it that is replayed later is ignored. Applying an activity
+    that is not newer than the one already recorded for its transaction leaves the totals
+    unchanged, so a sequence range that is replayed is not double counted.
+
+    Only the contributions and rollups touched by a session are written. commit should be called
+    before the SyncSession is Completed. Committed changes stay committed if the Complete command
+    then fails; the next session replays the range, which is harmless. rollback discards changes
+    that were not committed.
+    """
+
+    def __init__(self, path, key_func=default_element_key, version_func=default_element_version,
+                 amount_func=default_amount, dimensions_func=default_dimensions,
+                 retraction_types=RETRACTION_ACTIVITY_TYPES):
+        self.path = path
+        self.key_func = key_func
+        self.version_func = version_func
+        self.amount_func = amount_func
+        self.dimensions_func = dimensions_func
+        self.retraction_types = retraction_types
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS transaction_contribution ('
+                                'key TEXT NOT NULL PRIMARY KEY, '
+                                'sequence INTEGER NOT NULL, '
+                                'retracted INTEGER NOT NULL, '
+                                'version TEXT NOT NULL, '
+                                'amount TEXT, '
+                                'dimensions TEXT) WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS transaction_rollup ('
+                                'dimension TEXT NOT NULL, '
+                                'value TEXT NOT NULL, '
+                                'count INTEGER NOT NULL, '
+                                'amount TEXT NOT NULL, '
+                                'PRIMARY KEY (dimension, value)) WITHOUT ROWID')
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, traceback=None):
+        self.close()
+
+    def apply(self, activity):
+        key = self.key_func(activity)
+        sequence = int(activity[ACTIVITY_SEQUENCE_FIELD])
+        version = self.version_func(activity)
+        previous = self.connection.execute('SELECT sequence, retracted, version, amount, dimensions '
+                                           'FROM transaction_contribution WHERE key = ?', (key,)).fetchone()
+        previous_counted = False
+        if previous is not None:
+            previous_sequence, previous_retracted, previous_version, previous_amount, previous_dimensions = previous
+            if previous_sequence >= sequence:
+                # Already applied, or an older activity for a transaction that has since been replaced
+                return
+            previous_counted = not previous_retracted
+        if activity.get(ACTIVITY_TYPE_FIELD) in self.retraction_types:
+            if previous_counted:
+                if previous_version != version:
+                    # Retraction of a superseded version, the amended version stays counted
+                    return
+                self._add(Decimal(previous_amount), json.loads(previous_dimensions), -1)
+            self.connection.execute('INSERT OR REPLACE INTO transaction_contribution '
+                                    '(key, sequence, retracted, version, amount, dimensions) '
+                                    'VALUES (?, ?, 1, ?, NULL, NULL)', (key, sequence, version))
+            return
+        amount = self.amount_func(activity)
+        dimensions = self.dimensions_func(activity)
+        if previous_counted:
+            self._add(Decimal(previous_amount), json.loads(previous_dimensions), -1)
+        self._add(amount, dimensions, 1)
+        self.connection.execute('INSERT OR REPLACE INTO transaction_contribution '
+                                '(key, sequence, retracted, version, amount, dimensions) VALUES (?, ?, 0, ?, ?, ?)',
+                                (key, sequence, version, str(amount), json.dumps(dimensions)))
+
+    def apply_all(self, activities):
+        for activity in activities:
+            self.apply(activity)
+
+    def _add(self, amount, dimensions, sign):
+        buckets = [(TOTAL_DIMENSION, '')]
+        buckets.extend((dimension, str(value)) for dimension, value in dimensions.items() if value is not None)
+        for dimension, value in buckets:
+            row = self.connection.execute('SELECT count, amount FROM transaction_rollup '
+                                          'WHERE dimension = ? AND value = ?', (dimension, value)).fetchone()
+            count, total = (row[0], Decimal(row[1])) if row is not None else (0, Decimal(0))
+            count += sign
+            total += sign * amount
+            if count == 0 and dimension != TOTAL_DIMENSION:
+                # Drop buckets that no longer have any transactions
+                self.connection.execute('DELETE FROM transaction_rollup WHERE dimension = ? AND value = ?',
+                                        (dimension, value))
+            else:
+                self.connection.execute('INSERT OR REPLACE INTO transaction_rollup (dimension, value, count, amount) '
+                                        'VALUES (?, ?, ?, ?)', (dimension, value, count, str(total)))
+
+    @property
+    def totals(self):
+        return self.rollup(TOTAL_DIMENSION).get('', {'count': 0, 'amount': Decimal(0)})
+
+    def rollup(self, dimension):
+        """Returns the count and amount of each value of the dimension, e.g. rollup('filer')"""
+        cursor = self.connection.execute('SELECT value, count, amount FROM transaction_rollup WHERE dimension = ?',
+                                         (dimension,))
+        return {value: {'count': count, 'amount': Decimal(amount)} for value, count, amount in cursor}
+
+    def commit(self):
+        """Persists the changes applied since the last commit"""
+        self.connection.commit()
+        totals = self.totals
+        logger.info(f'Committed aggregates of {totals["count"]} transactions totaling {totals["amount"]}')
+
+    def rollback(self):
+        """Discards changes applied since the last committed session"""
+        logger.info('Discarding uncommitted transaction aggregate changes')
+        self.connection.rollback()
+
+    def close(self):
+        """Closes the aggregates file. Changes that were not committed are discarded"""
+        self.connection.close()
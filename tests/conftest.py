@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules are imported directly from src, as the scripts there do, so that the config loaded by src/__init__.py
+# is not required by the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,76 @@
+from activity_index import BloomFilter, SeenActivityIndex
+
+
+def activity(sequence):
+    return {'id': f'activity-{sequence}', 'publishSequence': sequence}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f'key-{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_filter_skips_activities_applied_by_earlier_session(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    activities = [activity(i) for i in range(100)]
+    with SeenActivityIndex(path, 'sub') as index:
+        assert index.filter(activities) == activities
+        index.mark_applied(activities[:60])
+
+    with SeenActivityIndex(path, 'sub') as index:
+        assert index.filter(activities) == activities[60:]
+
+    with SeenActivityIndex(path, 'other-sub') as index:
+        assert index.filter(activities) == activities
+
+
+def test_same_activity_with_new_sequence_is_not_skipped(tmp_path):
+    with SeenActivityIndex(str(tmp_path / 'seen.db'), 'sub') as index:
+        index.add({'id': 'a', 'publishSequence': 1})
+        assert index.filter([{'id': 'a', 'publishSequence': 2}]) == [{'id': 'a', 'publishSequence': 2}]
+
+
+def test_retention_prunes_old_sequences(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    activities = [activity(i) for i in range(100)]
+    with SeenActivityIndex(path, 'sub', retention=30) as index:
+        index.mark_applied(activities)
+
+    with SeenActivityIndex(path, 'sub', retention=30) as index:
+        assert index.item_count == 31
+        assert index.filter(activities) == activities[:69]
+
+
+def test_bloom_filter_is_sized_for_stored_entries(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    with SeenActivityIndex(path, 'sub', expected_items=10) as index:
+        index.mark_applied(activity(i) for i in range(500))
+        index.save()
+        assert index.bloom_capacity >= 500
+
+    with SeenActivityIndex(path, 'sub', expected_items=10) as index:
+        assert index.bloom_capacity >= 500
+        assert sum(index._key(f'new-{i}', i) in index.bloom for i in range(1000)) < 50
+
+
+def test_skipped_count_is_reset_when_saved(tmp_path):
+    with SeenActivityIndex(str(tmp_path / 'seen.db'), 'sub') as index:
+        index.mark_applied([activity(1)])
+        index.filter([activity(1)])
+        assert index.skipped_count == 1
+        index.save()
+        assert index.skipped_count == 0
+
+
+def test_replacing_an_entry_does_not_increase_item_count(tmp_path):
+    with SeenActivityIndex(str(tmp_path / 'seen.db'), 'sub') as index:
+        index.add({'id': 'a', 'publishSequence': 1})
+        index.add({'id': 'a', 'publishSequence': 2})
+        index.add({'id': 'a', 'publishSequence': 2})
+        assert index.item_count == 1
+        assert index.filter([{'id': 'a', 'publishSequence': 2}]) == []
@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+import pytest
+
+from transaction_aggregates import TransactionAggregates
+
+
+def activity(sequence, element_id, amount=None, activity_type='Add', filer='F1', tran_date='2026-01-05',
+             version='V1'):
+    return {
+        'id': f'activity-{sequence}',
+        'publishSequence': sequence,
+        'activityType': activity_type,
+        'element': {
+            'rootFilingNid': 'R1',
+            'elementId': element_id,
+            'elementNid': f'{element_id}-{version}',
+            'filerNid': filer,
+            'elementModel': {'amount': amount, 'cmteId': 'C1', 'tranDate': tran_date}
+        }
+    }
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    with TransactionAggregates(str(tmp_path / 'aggregates.db')) as aggregates:
+        yield aggregates
+
+
+def test_amendment_replaces_earlier_contribution(aggregates):
+    aggregates.apply_all([activity(1, 'e1', '10.50'), activity(2, 'e2', '5'),
+                          activity(3, 'e1', '12', activity_type='Amend', tran_date='2026-02-01', version='V2')])
+    assert aggregates.totals == {'count': 2, 'amount': Decimal('17')}
+    assert aggregates.rollup('period') == {'2026-01': {'count': 1, 'amount': Decimal('5')},
+                                           '2026-02': {'count': 1, 'amount': Decimal('12')}}
+    assert aggregates.rollup('filer_period')['F1|2026-02'] == {'count': 1, 'amount': Decimal('12')}
+
+
+def test_retraction_backs_out_contribution(aggregates):
+    aggregates.apply_all([activity(1, 'e1', '10'), activity(2, 'e2', '5'),
+                          activity(3, 'e1', activity_type='Retract')])
+    assert aggregates.totals == {'count': 1, 'amount': Decimal('5')}
+    assert aggregates.rollup('filer') == {'F1': {'count': 1, 'amount': Decimal('5')}}
+
+
+def test_replay_is_not_double_counted(aggregates):
+    activities = [activity(10, 'e1', '10'), activity(11, 'e2', '5')]
+    aggregates.apply_all(activities)
+    aggregates.apply_all(activities)
+    assert aggregates.totals == {'count': 2, 'amount': Decimal('15')}
+
+
+def test_replay_after_retraction_does_not_restore_transaction(aggregates):
+    aggregates.apply(activity(10, 'e1', '10'))
+    aggregates.apply(activity(20, 'e1', activity_type='Retract'))
+    aggregates.apply(activity(10, 'e1', '10'))
+    assert aggregates.totals == {'count': 0, 'amount': Decimal('0')}
+    assert aggregates.rollup('filer') == {}
+
+
+def test_retracting_superseded_version_keeps_amendment(aggregates):
+    aggregates.apply(activity(1, 'e1', '10', version='V1'))
+    aggregates.apply(activity(2, 'e1', '12', activity_type='Amend', version='V2'))
+    aggregates.apply(activity(3, 'e1', activity_type='Retract', version='V1'))
+    assert aggregates.totals == {'count': 1, 'amount': Decimal('12')}
+
+    aggregates.apply(activity(4, 'e1', activity_type='Retract', version='V2'))
+    assert aggregates.totals == {'count': 0, 'amount': Decimal('0')}
+
+
+def test_missing_element_identity_raises(aggregates):
+    with pytest.raises(Exception, match='has no rootFilingNid or elementId'):
+        aggregates.apply(activity(1, None, '10'))
+
+
+def test_missing_amount_raises(aggregates):
+    with pytest.raises(Exception, match='has no amount'):
+        aggregates.apply(activity(1, 'e1'))
+
+
+def test_commit_persists_changes(tmp_path):
+    path = str(tmp_path / 'aggregates.db')
+    with TransactionAggregates(path) as aggregates:
+        aggregates.apply(activity(1, 'e1', '10'))
+        aggregates.commit()
+
+    with TransactionAggregates(path) as aggregates:
+        assert aggregates.totals == {'count': 1, 'amount': Decimal('10')}
+
+
+def test_replay_after_commit_is_harmless(tmp_path):
+    path = str(tmp_path / 'aggregates.db')
+    with TransactionAggregates(path) as aggregates:
+        aggregates.apply(activity(1, 'e1', '10'))
+        aggregates.commit()
+
+    # The Complete command failed, so the next session replays the same range
+    with TransactionAggregates(path) as aggregates:
+        aggregates.apply(activity(1, 'e1', '10'))
+        aggregates.commit()
+        assert aggregates.totals == {'count': 1, 'amount': Decimal('10')}
+
+
+def test_rollback_discards_uncommitted_changes(tmp_path):
+    path = str(tmp_path / 'aggregates.db')
+    with TransactionAggregates(path) as aggregates:
+        aggregates.apply(activity(1, 'e1', '10'))
+        aggregates.commit()
+        aggregates.apply(activity(2, 'e2', '5'))
+        aggregates.rollback()
+        assert aggregates.totals == {'count': 1, 'amount': Decimal('10')}